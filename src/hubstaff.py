@@ -1,13 +1,26 @@
 import argparse
+import functools
+import json
 import logging
 import os
 import sys
-from datetime import date, datetime, timedelta
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
 from logging import getLogger
+from pathlib import Path
 
 import pandas as pd
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter, Retry
+
+try:  # optional SIMD-accelerated JSON parsing, several times faster than stdlib on big payloads
+    import orjson
+except ImportError:
+    orjson = None
 
 from src.models import Activity, Organization, Project
 from src.repositories import ActivityRepo, ProjectRepo, UserRepo
@@ -23,22 +36,58 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 
 
+TOKEN_CACHE_FILE = Path.home() / ".hubstaff_token.json"
+TOKEN_TTL_SECONDS = 12 * 60 * 60
+TOKEN_REFRESH_MARGIN_SECONDS = 60
+
+
 class HubStaffClientException(Exception):
     pass
 
 
+def _parse_json(response):
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def _records_to_frame(records: list[dict], columns) -> pd.DataFrame:
+    # Build column lists first so pandas assembles each column directly,
+    # skipping from_records' row-by-row transpose
+    data = {column: [record[column] for record in records] for column in columns}
+    return pd.DataFrame(data)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_session() -> requests.Session:
+    """Build the shared requests session once per process, with keep-alive pooling and retries."""
+    session = requests.Session()
+    # pool_maxsize bounds the live keep-alive connections per host; sized for the
+    # concurrent per-day fetches so they never queue on the adapter
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504]),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 class HubStaffClient:
     def __init__(self, organization_id=None, base_url=None, debug=False) -> None:
         if organization_id:
             self._organization_id = organization_id
 
-        self.session = requests.Session()  # TODO: Move to a RequestsClient class
+        self.session = _get_session()  # TODO: Move to a RequestsClient class
         self._base_url = os.environ.get("HUBSTAFF_BASE_URL", base_url)
         self._app_token = os.environ.get("HUBSTAFF_APP_TOKEN")
         self._debug = debug or os.environ.get("HUBSTAFF_DEBUG")
+        self._auth_token_expiry = 0.0  # monotonic deadline; 0 forces auth on first request
+        self._auth_lock = threading.Lock()  # the per-day workers share this client
         self._set_session_token()
         if self._debug:
-            logger.debug(f"Running Hubstaff client with org={self.organization_id}, app_token={self._app_token}")
+            logger.debug("Running Hubstaff client with org=%s, app_token=%s", self.organization_id, self._app_token)
 
     @property
     def organization_id(self):
@@ -61,42 +110,113 @@ class HubStaffClient:
     def _set_session_token(self):
         self.session.headers.update({"AppToken": self._app_token})
 
-    def _authenticate(self):
-        response = self.session.post(
-            f"{self.base_url}/v339/members/login", data=self.credentials
-        )  # TODO: Move to a RequestsClient class
-        if self._debug:
-            logger.debug(f"Trying to authenticate: {response.status_code}")
-        if response.status_code == 200 and "auth_token" in response.json():
-            self.session.headers.update({"AuthToken": response.json()["auth_token"]})
+    def _load_cached_token(self):
+        """Return (auth_token, seconds_left) from the on-disk cache, or (None, 0) if stale/missing."""
+        try:
+            cached = json.loads(TOKEN_CACHE_FILE.read_text())
+        except (OSError, ValueError):
+            return None, 0
+        if not isinstance(cached, dict):  # valid JSON but not our payload: treat as stale
+            return None, 0
+        remaining = cached.get("issued_at", 0) + TOKEN_TTL_SECONDS - time.time()
+        if remaining > 0:
+            return cached.get("auth_token"), remaining
+        return None, 0
+
+    def _store_cached_token(self, auth_token):
+        payload = json.dumps({"auth_token": auth_token, "issued_at": time.time()})
+        try:
+            # mkstemp creates the file 0600 (the token is a credential) and os.replace swaps it
+            # in atomically, so concurrent writers can never leave a truncated/interleaved cache
+            fd, tmp_path = tempfile.mkstemp(dir=TOKEN_CACHE_FILE.parent, prefix=TOKEN_CACHE_FILE.name)
+            with os.fdopen(fd, "w") as tmp_file:
+                tmp_file.write(payload)
+            os.replace(tmp_path, TOKEN_CACHE_FILE)
+        except OSError:
+            pass  # the cache is best-effort, next run will just re-authenticate
+
+    def _authenticate(self, force=False, stale_token=None):
+        with self._auth_lock:
+            # Re-check under the lock: whichever thread got here first refreshed for everyone
+            if stale_token is not None and self.session.headers.get("AuthToken") != stale_token:
+                return
+            if not force and time.monotonic() <= self._auth_token_expiry - TOKEN_REFRESH_MARGIN_SECONDS:
+                return
+            auth_token, expires_in = (None, 0) if force else self._load_cached_token()
+            if auth_token is None:
+                response = self.session.post(
+                    f"{self.base_url}/v339/members/login", data=self.credentials
+                )  # TODO: Move to a RequestsClient class
+                if self._debug:
+                    logger.debug("Trying to authenticate: %s", response.status_code)
+                if response.status_code == 200:
+                    data = _parse_json(response)  # parse once, the body was read twice before
+                    if "auth_token" in data:
+                        auth_token = data["auth_token"]
+                        expires_in = TOKEN_TTL_SECONDS
+                        self._store_cached_token(auth_token)
+            if auth_token:
+                self.session.headers.update({"AuthToken": auth_token})
+                self._auth_token_expiry = time.monotonic() + expires_in
 
     def _get(self, path, *args, **kwargs):  # TODO: Move to a RequestsClient class
         url = f"{self.base_url}/{path}"
-        if "AuthToken" not in self.session.headers:  # TODO: detect if auth_token expired
+        # Refresh proactively just before expiry so requests never race a dying token
+        if time.monotonic() > self._auth_token_expiry - TOKEN_REFRESH_MARGIN_SECONDS:
             self._authenticate()
-        return self.session.get(url, **kwargs)
+        token_used = self.session.headers.get("AuthToken")
+        response = self.session.get(url, **kwargs)
+        if response.status_code == 401:
+            # token revoked or expired server-side: re-auth past the disk cache and retry once;
+            # passing the token we just used keeps a burst of 401s to a single fresh login
+            self._authenticate(force=True, stale_token=token_used)
+            response = self.session.get(url, **kwargs)
+        return response
+
+    def _daily_activities_for_day(self, day: str) -> list[dict]:
+        response = self._get(
+            f"v339/company/{self.organization_id}/operations/by_day",
+            params={"date[stop]": day},
+            headers={"DateStart": day},
+        )
+        if self._debug:
+            logger.debug(
+                "Getting daily activities: day=%s, sc=%s, content=%s", day, response.status_code, response.content
+            )
 
-    def daily_activities(self, project_id=None, start=None, stop=None) -> list[Activity]:
+        if response.status_code == 200:
+            return _parse_json(response).get("daily_activities", [])
+        return []
+
+    def daily_activities_raw(self, start=None, stop=None) -> list[dict]:
+        """Fetch daily activities as the raw JSON records, without building Activity instances."""
         if start is None and stop is None:
             _today = datetime.today().date()
             start = _today.isoformat()
             stop = _today.isoformat()
 
-        self.session.headers.update({"DateStart": start})
+        # either bound may be given alone on the CLI; the other defaults to it
+        days = [day.date().isoformat() for day in pd.date_range(start=start or stop, end=stop or start)]
+        if not days:  # e.g. a reversed range; nothing to fetch
+            return []
 
-        response = self._get(f"v339/company/{self.organization_id}/operations/by_day", params={"date[stop]": stop})
-        if self._debug:
-            logger.debug(
-                f"Getting daily activities: start={start}, stop={stop}, sc={response.status_code}, content={response.content}"
-            )
+        # Authenticate once up front so the workers all reuse the same token instead of
+        # every thread independently POSTing /members/login on a cold start
+        if time.monotonic() > self._auth_token_expiry - TOKEN_REFRESH_MARGIN_SECONDS:
+            self._authenticate()
 
-        activities = []
-        if response.status_code == 200:
-            activities = response.json().get("daily_activities", [])
+        # One request per day, issued concurrently: wall time becomes ~1 RTT instead of N RTTs
+        with ThreadPoolExecutor(max_workers=min(len(days), 10)) as executor:
+            per_day = list(executor.map(self._daily_activities_for_day, days))
+        activities = [activity for day_activities in per_day for activity in day_activities]
 
         if self._debug:
-            logger.debug(f"Got activities={activities}")
+            logger.debug("Got activities=%s", activities)
+
+        return activities
 
+    def daily_activities(self, project_id=None, start=None, stop=None) -> list[Activity]:
+        activities = self.daily_activities_raw(start=start, stop=stop)
         return [
             Activity(
                 id=activity["id"],
@@ -122,14 +242,14 @@ class HubStaffClient:
     def projects(self) -> list[Project]:
         response = self._get(f"v339/company/{self.organization_id}/projects")
         if self._debug:
-            logger.debug(f"Getting projects: sc={response.status_code}, content={response.content}")
+            logger.debug("Getting projects: sc=%s, content=%s", response.status_code, response.content)
 
         projects = []
         if response.status_code == 200:
-            projects = response.json().get("projects", [])
+            projects = _parse_json(response).get("projects", [])
 
         if self._debug:
-            logger.debug(f"Got projects={projects}")
+            logger.debug("Got projects=%s", projects)
 
         return [
             Project(
@@ -144,30 +264,44 @@ class HubStaffClient:
         ]
 
 
-def render_output(activities_repo: ActivityRepo, projects_repo: ProjectRepo, start=None, stop=None):
+def render_output(activities_repo: ActivityRepo, projects_repo: ProjectRepo, activities=None, start=None, stop=None):
     """
     Present the aggregated information in an HTML table.
     In the columns, there should be the employees, in the rows, there should be the projects, and in the cells in the
     middle, there should be the amount of time that a given employee spent working on a given project
+
+    `activities` can be the raw JSON records from `daily_activities_raw`; when given, the pivot is built
+    straight from them without touching the DB or constructing Activity instances.
     """
-    raw_results = activities_repo.get(raw_data=True)  # TODO: implement filters
-    df = pd.DataFrame.from_records(data=raw_results, columns=Activity.__annotations__.keys())
+    if activities is not None:
+        df = _records_to_frame(activities, Activity.__annotations__.keys())
+        df["date"] = pd.to_datetime(df["date"], cache=True)  # datetime64: the filter below compares in C
+        if start is not None:
+            df = df.loc[df["date"].between(start, stop or start)]
+    else:
+        # read_sql_query builds the frame from SQLite's column buffers, skipping per-row Activity
+        # objects; the date filter runs in SQL against the unique index on activities.date
+        query = "SELECT * FROM activities"
+        params = None
+        if start is not None:
+            query += " WHERE date BETWEEN ? AND ?"
+            params = (start, stop or start)
+        df = pd.read_sql_query(
+            query,
+            activities_repo.connection,
+            params=params,
+            parse_dates=["date", "created_at", "updated_at"],
+        )
 
     # Merging to get project name and improve readability
-    projects_df = pd.DataFrame.from_records(
-        data=projects_repo.get(raw_data=True), columns=Project.__annotations__.keys()
-    )
+    projects_df = pd.read_sql_query("SELECT * FROM projects", projects_repo.connection)
     df = df.merge(projects_df, left_on="project_id", right_on="id", suffixes=("", "_project"))
 
-    if start == stop and start is not None:
-        df = df[df["date"] == start]
-    elif start is not None and stop is not None:
-        df = df[(df["date"] >= start) & (df["date"] <= stop)]
     pivot = pd.pivot_table(df, index=["user_id"], columns=["name"], values="tracked", aggfunc="sum").fillna(0)
 
-    to_hour = lambda x: str(timedelta(seconds=x))
-    for col in pivot.columns:
-        pivot[col] = pivot[col].apply(to_hour)  # improve readability
+    # Format seconds as readable durations in one vectorized pass instead of a Python lambda per cell
+    if not pivot.empty:
+        pivot = pd.to_timedelta(pivot.astype("int64").stack(), unit="s").astype(str).unstack()
     html = pivot.to_html()
     print(html)
 
@@ -177,12 +311,17 @@ def main(organization_id, start=None, stop=None, report=None, debug=False):
     prepo = ProjectRepo()
     if not report:
         hc = HubStaffClient(organization_id=organization_id)
-        activities = hc.daily_activities(start=start, stop=stop)
-        arepo.insert(activities)
-        projects = hc.projects()
+        # The two fetches are independent round trips, so overlap them; inserts stay on
+        # this thread since the repos share one SQLite connection
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            activities_future = executor.submit(hc.daily_activities_raw, start=start, stop=stop)
+            projects_future = executor.submit(hc.projects)
+            records, projects = activities_future.result(), projects_future.result()
+        # Raw records go straight to SQLite as tuples; no Activity instance is ever built here
+        arepo.insert_records(records)
         prepo.insert(projects)
 
-    render_output(arepo, prepo, start=None, stop=None)
+    render_output(arepo, prepo, start=start, stop=stop)
 
 
 def install(debug=False):
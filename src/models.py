@@ -2,7 +2,16 @@ from dataclasses import dataclass
 from datetime import date, datetime
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
+class Organization:
+    id: int
+    name: str
+    status: str
+    created_at: datetime
+    updated_at: datetime
+
+
+@dataclass(slots=True, frozen=True)
 class Project:
     id: int
     name: str
@@ -12,7 +21,7 @@ class Project:
     updated_at: datetime
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class User:
     id: int
     name: str
@@ -23,7 +32,7 @@ class User:
     updated_at: datetime
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Activity:
     id: int
     date: date
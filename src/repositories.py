@@ -1,4 +1,6 @@
 import abc
+import functools
+import itertools
 import os
 import sqlite3
 from datetime import date, datetime
@@ -6,8 +8,20 @@ from typing import Any, Generic, Optional, TypeVar
 
 from src.models import Activity, Project, User
 
+try:  # optional fast path for bulk inserts, used when pyarrow + adbc are installed
+    import pyarrow
+    from adbc_driver_sqlite import dbapi as adbc_dbapi
+except ImportError:
+    pyarrow = None
+    adbc_dbapi = None
+
 T = TypeVar("T")
 
+# Columns declared DATE/DATETIME come back as native objects (PARSE_DECLTYPES below),
+# so the repos never parse timestamps row by row in Python
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode()))
+
 
 class AbstractRepo(abc.ABC, Generic[T]):
     @abc.abstractmethod
@@ -23,12 +37,29 @@ class AbstractRepo(abc.ABC, Generic[T]):
         pass
 
 
+@functools.lru_cache(maxsize=1)
+def _get_connection() -> sqlite3.Connection:
+    """Open the SQLite connection once per process; every repo shares it."""
+    connector = sqlite3.connect(os.environ.get("DB_FILENAME", "hubstaff.db"), detect_types=sqlite3.PARSE_DECLTYPES)
+    # Fast-path PRAGMAs: WAL + NORMAL avoid an fsync per commit, temp tables and a
+    # bigger page cache stay in memory (cache_size is in KiB when negative)
+    connector.execute("PRAGMA journal_mode=WAL")
+    connector.execute("PRAGMA synchronous=NORMAL")
+    connector.execute("PRAGMA temp_store=MEMORY")
+    connector.execute("PRAGMA cache_size=-20000")
+    return connector
+
+
 class SQLiteRepo(AbstractRepo):
-    def __init__(self) -> None:
-        self._connector = sqlite3.connect(os.environ.get("DB_FILENAME", "hubstaff.db"))
+    def __init__(self, connection: Optional[sqlite3.Connection] = None) -> None:
+        self._connector = connection or _get_connection()
         self._cursor = self._connector.cursor()
         super().__init__()
 
+    @property
+    def connection(self) -> sqlite3.Connection:
+        return self._connector
+
     def create_table(self, table: str, columns: dict[str, str]) -> None:
         query = f"CREATE TABLE IF NOT EXISTS {table} ("
         query += ", ".join([f"{k} {v}" for k, v in columns.items()])
@@ -36,30 +67,42 @@ class SQLiteRepo(AbstractRepo):
         self._cursor.execute(query)
         self._connector.commit()
 
-    def get(self, table, **kwargs) -> Optional[Any]:
+    def _build_select(self, table, filters: Optional[dict]) -> tuple[str, tuple]:
+        # `?` placeholders instead of inlined values: not injectable, and SQLite can reuse
+        # the cached statement plan across calls since the query text stays constant
         query = f"SELECT * FROM {table}"
-        if kwargs.get("filters"):
+        params = ()
+        if filters:
             query += " WHERE "
-            query += " AND ".join([f"{k}={v}" for k, v in kwargs.get("filters").items()])
+            query += " AND ".join([f"{k}=?" for k in filters])
+            params = tuple(filters.values())
+        return query, params
 
-        res = self._cursor.execute(query)
+    def get(self, table, **kwargs) -> Optional[Any]:
+        query, params = self._build_select(table, kwargs.get("filters"))
+        res = self._cursor.execute(query, params)
         return res.fetchall()
 
     def get_one(self, table, **kwargs) -> Optional[Any]:
-        query = f"SELECT * FROM {table}"
-        if kwargs.get("filters"):
-            query += " WHERE "
-            query += " AND ".join([f"{k}={v}" for k, v in kwargs.get("filters").items()])
-
-        res = self._cursor.execute(query)
+        query, params = self._build_select(table, kwargs.get("filters"))
+        res = self._cursor.execute(query, params)
         return res.fetchone()
 
     def insert(self, table, **kwargs) -> None:
-        values = kwargs.get("values")  # values is a list of tuples
+        values = kwargs.get("values")  # any iterable of tuples, generators included
+        width = kwargs.get("width")
+        if width is None:
+            # peek the first row for the placeholder count, then stitch it back
+            values = iter(values)
+            first = next(values, None)
+            if first is None:
+                return
+            width = len(first)
+            values = itertools.chain((first,), values)
         query = "INSERT"
         if kwargs.get("on_conflict"):
             query += f" OR {kwargs.get('on_conflict')}"
-        query += f" INTO {table} VALUES ({('?,' * len(values[0])).rstrip(',')})"
+        query += f" INTO {table} VALUES ({('?,' * width).rstrip(',')})"
         self._cursor.executemany(query, values)
         self._connector.commit()
 
@@ -70,6 +113,13 @@ class ActivityBaseRepo(AbstractRepo[Activity], metaclass=abc.ABCMeta):
 
 class ActivityRepo(SQLiteRepo, ActivityBaseRepo):
     entity = Activity
+    columns = tuple(Activity.__annotations__)
+
+    # Constant query text: no string building per call, and SQLite's statement cache
+    # always gets a hit
+    _SELECT_SQL = "SELECT * FROM activities"
+    _SELECT_BY_DATE_SQL = "SELECT * FROM activities WHERE date BETWEEN ? AND ?"
+    _INSERT_SQL = f"INSERT OR REPLACE INTO activities VALUES ({','.join('?' * len(columns))})"
 
     def create_table(self) -> None:
         table = "activities"
@@ -92,10 +142,16 @@ class ActivityRepo(SQLiteRepo, ActivityBaseRepo):
             "updated_at": "DATETIME",
         }
 
+        # no extra index for the date-range reports: DATE UNIQUE already maintains one
         return super().create_table(table, columns)
 
     def get(self, **kwargs) -> list[Activity] | None:
-        rows = super().get(table="activities")
+        date_start, date_stop = kwargs.get("date_start"), kwargs.get("date_stop")
+        if date_start is not None:
+            res = self._cursor.execute(self._SELECT_BY_DATE_SQL, (date_start, date_stop or date_start))
+        else:
+            res = self._cursor.execute(self._SELECT_SQL)
+        rows = res.fetchall()
         if kwargs.get("raw_data"):
             return rows
 
@@ -103,7 +159,7 @@ class ActivityRepo(SQLiteRepo, ActivityBaseRepo):
             return [
                 Activity(
                     id=row[0],
-                    date=date.fromisoformat(row[1]),
+                    date=row[1],
                     user_id=row[2],
                     project_id=row[3],
                     task_id=row[4],
@@ -116,15 +172,14 @@ class ActivityRepo(SQLiteRepo, ActivityBaseRepo):
                     idle=row[11],
                     resumed=row[12],
                     billable=row[13],
-                    created_at=datetime.fromisoformat(row[14]),
-                    updated_at=datetime.fromisoformat(row[15]),
+                    created_at=row[14],
+                    updated_at=row[15],
                 )
                 for row in rows
             ]
 
     def insert(self, activities: list[Activity]) -> None:
-        table = "activities"
-        values = [
+        values = (
             (
                 obj.id,
                 obj.date.isoformat(),
@@ -144,8 +199,41 @@ class ActivityRepo(SQLiteRepo, ActivityBaseRepo):
                 obj.updated_at.isoformat(),
             )
             for obj in activities
-        ]
-        return super().insert(table, values=values, on_conflict="REPLACE")
+        )  # generator: executemany consumes it row by row without materializing the list
+        self._cursor.executemany(self._INSERT_SQL, values)
+        self._connector.commit()
+
+    def insert_records(self, records: list[dict]) -> None:
+        """
+        Bulk-insert raw JSON activity records (as returned by `daily_activities_raw`).
+
+        When pyarrow + adbc_driver_sqlite are installed, the records are ingested as a single
+        columnar Arrow table instead of one bind call per row; otherwise falls back to the
+        regular executemany path. Dates/timestamps stay as the ISO strings the API returned,
+        which is what SQLite stores anyway.
+        """
+        if not records:
+            return  # an empty fetch is a normal day; pyarrow also can't infer a schema from no rows
+        if adbc_dbapi is not None:
+            return self._insert_records_adbc(records)
+
+        values = (tuple(record[column] for column in self.columns) for record in records)
+        self._cursor.executemany(self._INSERT_SQL, values)
+        self._connector.commit()
+
+    def _insert_records_adbc(self, records: list[dict]) -> None:
+        rows = [{column: record[column] for column in self.columns} for record in records]
+        table = pyarrow.Table.from_pylist(rows)
+        # Resolve the database file from the connection this repo actually uses, so an explicit
+        # connection (or a DB_FILENAME changed since _get_connection cached it) is honored
+        db_path = self._connector.execute("PRAGMA database_list").fetchone()[2]
+        # Ingest into a staging table, then upsert in SQL to keep INSERT OR REPLACE semantics
+        with adbc_dbapi.connect(db_path) as connection:
+            with connection.cursor() as cursor:
+                cursor.adbc_ingest("activities_staging", table, mode="replace")
+                cursor.execute("INSERT OR REPLACE INTO activities SELECT * FROM activities_staging")
+                cursor.execute("DROP TABLE activities_staging")
+            connection.commit()
 
 
 class ProjectBaseRepo(AbstractRepo[Project], metaclass=abc.ABCMeta):
@@ -154,6 +242,10 @@ class ProjectBaseRepo(AbstractRepo[Project], metaclass=abc.ABCMeta):
 
 class ProjectRepo(SQLiteRepo, ProjectBaseRepo):
     entity = Project
+    columns = tuple(Project.__annotations__)
+
+    _SELECT_SQL = "SELECT * FROM projects"
+    _INSERT_SQL = f"INSERT OR IGNORE INTO projects VALUES ({','.join('?' * len(columns))})"
 
     def create_table(self) -> None:
         table = "projects"
@@ -169,7 +261,7 @@ class ProjectRepo(SQLiteRepo, ProjectBaseRepo):
         return super().create_table(table, columns)
 
     def get(self, **kwargs) -> list[Project] | None:
-        rows = super().get(table="projects")
+        rows = self._cursor.execute(self._SELECT_SQL).fetchall()
         if kwargs.get("raw_data"):
             return rows
         if rows:
@@ -179,8 +271,8 @@ class ProjectRepo(SQLiteRepo, ProjectBaseRepo):
                     name=row[1],
                     status=row[2],
                     billable=bool(row[3]),
-                    created_at=datetime.fromisoformat(row[4]),
-                    updated_at=datetime.fromisoformat(row[5]),
+                    created_at=row[4],
+                    updated_at=row[5],
                 )
                 for row in rows
             ]
@@ -190,7 +282,8 @@ class ProjectRepo(SQLiteRepo, ProjectBaseRepo):
             (obj.id, obj.name, obj.status, obj.billable, obj.created_at.isoformat(), obj.updated_at.isoformat())
             for obj in projects
         ]
-        return super().insert(table="projects", values=values, on_conflict="IGNORE")
+        self._cursor.executemany(self._INSERT_SQL, values)
+        self._connector.commit()
 
 
 class UserBaseRepo(AbstractRepo[User], metaclass=abc.ABCMeta):